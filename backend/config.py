@@ -8,5 +8,44 @@ SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 SUPABASE_SERVICE_KEY = os.getenv("SUPABASE_SERVICE_KEY")
 
 FACE_MATCH_THRESHOLD = 0.6
-DUPLICATE_TIME_WINDOW_HOURS = 24
+FACE_IMAGE_BUCKET = "faces"
+
+YUNET_MODEL_PATH = os.getenv(
+    "YUNET_MODEL_PATH",
+    os.path.join(os.path.dirname(__file__), "models", "face_detection_yunet_2023mar.onnx")
+)
+YUNET_INPUT_SIZE = 320
+YUNET_SCORE_THRESHOLD = 0.6
+YUNET_NMS_THRESHOLD = 0.3
+YUNET_TOP_K = 5000
+FACE_CROP_SIZE = 160
+BULK_REGISTRATION_MAX_BENEFICIARIES = 500
+BULK_REGISTRATION_BATCH_SIZE = 32
+
+FACE_INFERENCE_URL = os.getenv("FACE_INFERENCE_URL")
+FACE_INFERENCE_MODEL = os.getenv("FACE_INFERENCE_MODEL", "facenet")
+FACE_INFERENCE_INPUT_NAME = "input"
+FACE_INFERENCE_OUTPUT_NAME = "embedding"
+FACE_INFERENCE_TIMEOUT_SECONDS = 10
+
+FACE_EMBEDDING_DIM = 512
+FACE_DUPLICATE_DISTANCE_THRESHOLD = 0.4
+FACE_GALLERY_PAGE_SIZE = 1000
+FACE_GALLERY_REFRESH_SECONDS = 300
+SUSPICIOUS_TIMING_WINDOW_HOURS = 2
 MAX_TRANSACTIONS_PER_CYCLE = 1
+
+BENEFICIARY_CACHE_SIZE = 10000
+BENEFICIARY_CACHE_TTL_SECONDS = 60
+ACTIVE_CYCLE_CACHE_TTL_SECONDS = 300
+DASHBOARD_STATS_CACHE_TTL_SECONDS = 15
+
+HTTP_MAX_CONNECTIONS = 30
+HTTP_MAX_KEEPALIVE_CONNECTIONS = 15
+HTTP_KEEPALIVE_EXPIRY_SECONDS = 30
+
+SUPABASE_RETRY_MAX_ATTEMPTS = 5
+SUPABASE_RETRY_BASE_DELAY_SECONDS = 0.1
+SUPABASE_RETRY_MAX_DELAY_SECONDS = 5.0
+
+UVICORN_WORKERS = int(os.getenv("UVICORN_WORKERS", "1"))
@@ -1,7 +1,54 @@
-from supabase import create_client, Client
-from config import SUPABASE_URL, SUPABASE_SERVICE_KEY
+import httpx
+from typing import Any, Awaitable, Callable, Hashable
+from cachetools import TTLCache
+from supabase import AsyncClient
+from db_utils import raise_for_retryable_status
+from config import (
+    SUPABASE_URL,
+    SUPABASE_SERVICE_KEY,
+    HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_KEEPALIVE_CONNECTIONS,
+    HTTP_KEEPALIVE_EXPIRY_SECONDS
+)
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
+def create_http_client(timeout: float) -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        http2=True,
+        timeout=timeout,
+        follow_redirects=True,
+        event_hooks={"response": [raise_for_retryable_status]},
+        limits=httpx.Limits(
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            max_connections=HTTP_MAX_CONNECTIONS,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY_SECONDS
+        )
+    )
 
-def get_supabase_client() -> Client:
+class PooledAsyncClient(AsyncClient):
+    @staticmethod
+    def _init_postgrest_client(rest_url, headers, schema, timeout, **kwargs):
+        return AsyncClient._init_postgrest_client(
+            rest_url, headers, schema, http_client=create_http_client(timeout)
+        )
+
+    @staticmethod
+    def _init_storage_client(storage_url, headers, storage_client_timeout, **kwargs):
+        return AsyncClient._init_storage_client(
+            storage_url, headers, http_client=create_http_client(storage_client_timeout)
+        )
+
+supabase: AsyncClient = PooledAsyncClient(SUPABASE_URL, SUPABASE_SERVICE_KEY)
+
+def get_supabase_client() -> AsyncClient:
     return supabase
+
+async def cached_supabase_request(
+    cache: TTLCache, key: Hashable, fetcher: Callable[[], Awaitable[Any]]
+) -> Any:
+    if key in cache:
+        return cache[key]
+
+    value = await fetcher()
+    if value is not None:
+        cache[key] = value
+    return value
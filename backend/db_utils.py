@@ -0,0 +1,76 @@
+import asyncio
+import random
+from typing import Awaitable, Callable, Optional, TypeVar
+import httpx
+from config import (
+    SUPABASE_RETRY_MAX_ATTEMPTS,
+    SUPABASE_RETRY_BASE_DELAY_SECONDS,
+    SUPABASE_RETRY_MAX_DELAY_SECONDS
+)
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+RETRYABLE_ERROR_CODES = {"PGRST000", "PGRST001", "PGRST002", "PGRST003", "40001", "40P01", "57014"}
+ERROR_BODY_MAX_CHARS = 500
+
+async def execute_with_retry(
+    fn: Callable[[], Awaitable[T]],
+    max_attempts: int = SUPABASE_RETRY_MAX_ATTEMPTS,
+    base: float = SUPABASE_RETRY_BASE_DELAY_SECONDS,
+    cap: float = SUPABASE_RETRY_MAX_DELAY_SECONDS
+) -> T:
+    for attempt in range(max_attempts):
+        try:
+            return await fn()
+        except Exception as e:
+            if attempt == max_attempts - 1 or not _is_retryable(e):
+                raise
+
+            delay = _retry_after_seconds(e)
+            if delay is None:
+                delay = min(cap, base * 2 ** attempt) * random.uniform(0.5, 1.5)
+            delay = min(cap, delay)
+
+            print(f"Retrying request in {delay:.2f}s after error: {str(e)}")
+            await asyncio.sleep(delay)
+
+class RetryableStatusError(Exception):
+    def __init__(self, response: httpx.Response):
+        super().__init__(
+            f"{response.status_code} response from {response.request.url}: "
+            f"{response.text[:ERROR_BODY_MAX_CHARS]}"
+        )
+        self.response = response
+
+async def raise_for_retryable_status(response: httpx.Response) -> None:
+    if response.status_code in RETRYABLE_STATUS_CODES:
+        await response.aread()
+        raise RetryableStatusError(response)
+
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, httpx.TransportError):
+        return True
+    if getattr(error, "code", None) in RETRYABLE_ERROR_CODES:
+        return True
+    return _status_code(error) in RETRYABLE_STATUS_CODES
+
+def _status_code(error: Exception) -> Optional[int]:
+    if isinstance(error, (httpx.HTTPStatusError, RetryableStatusError)):
+        return error.response.status_code
+
+    for attribute in ("status", "code"):
+        try:
+            return int(getattr(error, attribute, None))
+        except (TypeError, ValueError):
+            continue
+    return None
+
+def _retry_after_seconds(error: Exception) -> Optional[float]:
+    if not isinstance(error, (httpx.HTTPStatusError, RetryableStatusError)):
+        return None
+
+    try:
+        return float(error.response.headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
@@ -1,54 +1,83 @@
-from datetime import datetime, timedelta
+import asyncio
+from datetime import datetime, timedelta, timezone
 from typing import List, Dict, Optional
+from uuid import uuid4
 from database import get_supabase_client
-from config import DUPLICATE_TIME_WINDOW_HOURS
+from db_utils import execute_with_retry
+from face_recognition_service import face_service
+from config import SUSPICIOUS_TIMING_WINDOW_HOURS, FACE_DUPLICATE_DISTANCE_THRESHOLD
 
 class DuplicateDetectionService:
     def __init__(self):
         self.supabase = get_supabase_client()
 
-    def check_duplicate_attempts(
+    async def check_duplicate_attempts(
         self,
         beneficiary_id: str,
         card_number: str,
         shop_id: str,
-        current_cycle_id: Optional[str] = None
+        current_cycle_id: Optional[str] = None,
+        face_embedding: Optional[str] = None
     ) -> List[Dict]:
-        alerts = []
-
-        same_card_different_person = self._check_same_card_different_person(
-            card_number, beneficiary_id
+        transaction_alerts, face_match = await asyncio.gather(
+            self._check_duplicate_transactions(
+                beneficiary_id, card_number, shop_id, current_cycle_id
+            ),
+            self._check_face_registered_to_other_beneficiary(beneficiary_id, face_embedding)
         )
-        if same_card_different_person:
-            alerts.append(same_card_different_person)
 
-        duplicate_location = self._check_duplicate_location(
-            beneficiary_id, shop_id, current_cycle_id
-        )
-        if duplicate_location:
-            alerts.append(duplicate_location)
+        if face_match:
+            transaction_alerts.append(face_match)
+        return transaction_alerts
 
-        multiple_attempts = self._check_multiple_attempts_same_cycle(
-            beneficiary_id, current_cycle_id
-        )
-        if multiple_attempts:
-            alerts.append(multiple_attempts)
+    async def _check_duplicate_transactions(
+        self,
+        beneficiary_id: str,
+        card_number: str,
+        shop_id: str,
+        current_cycle_id: Optional[str] = None
+    ) -> List[Dict]:
+        try:
+            response = await execute_with_retry(
+                self.supabase.rpc("check_duplicates", {
+                    "p_beneficiary_id": beneficiary_id,
+                    "p_card_number": card_number,
+                    "p_shop_id": shop_id,
+                    "p_cycle_id": current_cycle_id,
+                    "p_window_hours": SUSPICIOUS_TIMING_WINDOW_HOURS
+                }).execute
+            )
 
-        suspicious_timing = self._check_suspicious_timing(
-            beneficiary_id, shop_id
+            return response.data or []
+        except Exception as e:
+            print(f"Error running consolidated duplicate check: {str(e)}")
+            return await self._check_duplicate_attempts_individually(
+                beneficiary_id, card_number, shop_id, current_cycle_id
+            )
+
+    async def _check_duplicate_attempts_individually(
+        self,
+        beneficiary_id: str,
+        card_number: str,
+        shop_id: str,
+        current_cycle_id: Optional[str] = None
+    ) -> List[Dict]:
+        results = await asyncio.gather(
+            self._check_same_card_different_person(card_number, beneficiary_id),
+            self._check_duplicate_location(beneficiary_id, shop_id, current_cycle_id),
+            self._check_multiple_attempts_same_cycle(beneficiary_id, current_cycle_id),
+            self._check_suspicious_timing(beneficiary_id, shop_id)
         )
-        if suspicious_timing:
-            alerts.append(suspicious_timing)
 
-        return alerts
+        return [alert for alert in results if alert]
 
-    def _check_same_card_different_person(
+    async def _check_same_card_different_person(
         self, card_number: str, current_beneficiary_id: str
     ) -> Optional[Dict]:
         try:
-            response = self.supabase.table("transactions").select(
+            response = await execute_with_retry(self.supabase.table("transactions").select(
                 "id, beneficiary_id, created_at, shop_id"
-            ).eq("card_number", card_number).order("created_at", desc=True).limit(5).execute()
+            ).eq("card_number", card_number).order("created_at", desc=True).limit(5).execute)
 
             if response.data:
                 for transaction in response.data:
@@ -64,7 +93,29 @@ class DuplicateDetectionService:
             print(f"Error checking same card different person: {str(e)}")
             return None
 
-    def _check_duplicate_location(
+    async def _check_face_registered_to_other_beneficiary(
+        self, current_beneficiary_id: str, face_embedding: Optional[str]
+    ) -> Optional[Dict]:
+        if not face_embedding:
+            return None
+
+        try:
+            for match in await face_service.find_nearest(face_embedding, k=5):
+                if match["distance"] >= FACE_DUPLICATE_DISTANCE_THRESHOLD:
+                    break
+                if match["id"] != current_beneficiary_id:
+                    return {
+                        "alert_type": "different_person",
+                        "description": f"Captured face matches the beneficiary registered on card {match['card_number']}",
+                        "severity": "critical",
+                        "previous_transaction_id": None
+                    }
+            return None
+        except Exception as e:
+            print(f"Error checking face against other beneficiaries: {str(e)}")
+            return None
+
+    async def _check_duplicate_location(
         self, beneficiary_id: str, current_shop_id: str, cycle_id: Optional[str]
     ) -> Optional[Dict]:
         try:
@@ -75,7 +126,7 @@ class DuplicateDetectionService:
             if cycle_id:
                 query = query.eq("cycle_id", cycle_id)
 
-            response = query.order("created_at", desc=True).limit(10).execute()
+            response = await execute_with_retry(query.order("created_at", desc=True).limit(10).execute)
 
             if response.data:
                 for transaction in response.data:
@@ -91,23 +142,25 @@ class DuplicateDetectionService:
             print(f"Error checking duplicate location: {str(e)}")
             return None
 
-    def _check_multiple_attempts_same_cycle(
+    async def _check_multiple_attempts_same_cycle(
         self, beneficiary_id: str, cycle_id: Optional[str]
     ) -> Optional[Dict]:
         try:
             query = self.supabase.table("transactions").select(
-                "id, created_at"
+                "id", count="exact"
             ).eq("beneficiary_id", beneficiary_id).eq("status", "success")
 
             if cycle_id:
                 query = query.eq("cycle_id", cycle_id)
 
-            response = query.execute()
+            response = await execute_with_retry(
+                query.order("created_at", desc=True).limit(1).execute
+            )
 
-            if response.data and len(response.data) > 1:
+            if response.data and response.count and response.count > 1:
                 return {
                     "alert_type": "multiple_attempts",
-                    "description": f"Beneficiary has {len(response.data)} transactions in current cycle",
+                    "description": f"Beneficiary has {response.count} transactions in current cycle",
                     "severity": "high",
                     "previous_transaction_id": response.data[0]["id"]
                 }
@@ -116,37 +169,36 @@ class DuplicateDetectionService:
             print(f"Error checking multiple attempts: {str(e)}")
             return None
 
-    def _check_suspicious_timing(
+    async def _check_suspicious_timing(
         self, beneficiary_id: str, shop_id: str
     ) -> Optional[Dict]:
         try:
-            time_window = datetime.now() - timedelta(hours=DUPLICATE_TIME_WINDOW_HOURS)
+            now = datetime.now(timezone.utc)
+            cutoff = now - timedelta(hours=SUSPICIOUS_TIMING_WINDOW_HOURS)
 
-            response = self.supabase.table("transactions").select(
-                "id, created_at, shop_id"
+            response = await execute_with_retry(self.supabase.table("transactions").select(
+                "id, created_at"
             ).eq("beneficiary_id", beneficiary_id).gte(
-                "created_at", time_window.isoformat()
-            ).execute()
+                "created_at", cutoff.isoformat()
+            ).order("created_at", desc=True).limit(1).execute)
 
-            if response.data and len(response.data) > 0:
-                for transaction in response.data:
-                    trans_time = datetime.fromisoformat(transaction["created_at"].replace('Z', '+00:00'))
-                    time_diff = datetime.now(trans_time.tzinfo) - trans_time
-                    hours_diff = time_diff.total_seconds() / 3600
+            if response.data:
+                transaction = response.data[0]
+                trans_time = datetime.fromisoformat(transaction["created_at"].replace('Z', '+00:00'))
+                hours_diff = (now - trans_time).total_seconds() / 3600
 
-                    if hours_diff < 2:
-                        return {
-                            "alert_type": "suspicious_timing",
-                            "description": f"Multiple transactions within {hours_diff:.1f} hours",
-                            "severity": "medium",
-                            "previous_transaction_id": transaction["id"]
-                        }
+                return {
+                    "alert_type": "suspicious_timing",
+                    "description": f"Multiple transactions within {hours_diff:.1f} hours",
+                    "severity": "medium",
+                    "previous_transaction_id": transaction["id"]
+                }
             return None
         except Exception as e:
             print(f"Error checking suspicious timing: {str(e)}")
             return None
 
-    def create_alert(
+    async def create_alert(
         self,
         alert_type: str,
         beneficiary_id: str,
@@ -166,13 +218,16 @@ class DuplicateDetectionService:
                 "shop_id": shop_id,
                 "description": description,
                 "severity": severity,
-                "status": "pending"
+                "status": "pending",
+                "idempotency_key": str(uuid4())
             }
 
             if previous_transaction_id:
                 alert_data["previous_transaction_id"] = previous_transaction_id
 
-            response = self.supabase.table("duplicate_alerts").insert(alert_data).execute()
+            response = await execute_with_retry(self.supabase.table("duplicate_alerts").upsert(
+                alert_data, on_conflict="idempotency_key"
+            ).execute)
 
             if response.data:
                 return response.data[0]["id"]
@@ -181,4 +236,34 @@ class DuplicateDetectionService:
             print(f"Error creating alert: {str(e)}")
             return None
 
+    async def create_alerts_bulk(self, alerts: List[Dict]) -> List[str]:
+        if not alerts:
+            return []
+
+        try:
+            alert_rows = [
+                {
+                    "alert_type": alert["alert_type"],
+                    "beneficiary_id": alert["beneficiary_id"],
+                    "card_number": alert["card_number"],
+                    "transaction_id": alert["transaction_id"],
+                    "shop_id": alert["shop_id"],
+                    "description": alert["description"],
+                    "severity": alert["severity"],
+                    "previous_transaction_id": alert.get("previous_transaction_id"),
+                    "status": "pending",
+                    "idempotency_key": str(uuid4())
+                }
+                for alert in alerts
+            ]
+
+            response = await execute_with_retry(self.supabase.table("duplicate_alerts").upsert(
+                alert_rows, on_conflict="idempotency_key"
+            ).execute)
+
+            return [row["id"] for row in response.data or []]
+        except Exception as e:
+            print(f"Error creating alerts: {str(e)}")
+            return []
+
 duplicate_service = DuplicateDetectionService()
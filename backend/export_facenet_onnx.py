@@ -0,0 +1,28 @@
+import os
+import onnx
+import tensorflow as tf
+import tf2onnx
+from onnxconverter_common import float16
+from deepface import DeepFace
+from config import FACE_CROP_SIZE, FACE_INFERENCE_INPUT_NAME, FACE_INFERENCE_OUTPUT_NAME
+
+ONNX_MODEL_PATH = os.path.join(os.path.dirname(__file__), "triton", "facenet", "1", "model.onnx")
+
+def export_facenet_onnx(output_path: str = ONNX_MODEL_PATH) -> None:
+    model = DeepFace.build_model("Facenet512").model
+    inputs = tf.keras.Input((FACE_CROP_SIZE, FACE_CROP_SIZE, 3), name=FACE_INFERENCE_INPUT_NAME)
+    outputs = tf.keras.layers.Activation("linear", name=FACE_INFERENCE_OUTPUT_NAME)(model(inputs))
+
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    model_proto, _ = tf2onnx.convert.from_keras(
+        tf.keras.Model(inputs, outputs),
+        input_signature=[tf.TensorSpec(
+            (None, FACE_CROP_SIZE, FACE_CROP_SIZE, 3), tf.float32, name=FACE_INFERENCE_INPUT_NAME
+        )],
+        opset=13
+    )
+    onnx.save(float16.convert_float_to_float16(model_proto), output_path)
+    print(f"Exported Facenet512 to {output_path}")
+
+if __name__ == "__main__":
+    export_facenet_onnx()
@@ -1,51 +1,303 @@
+import os
+import asyncio
+import threading
+import time
 import cv2
+import httpx
 import numpy as np
 import base64
-from typing import Optional, Tuple, List
+from typing import Optional, Tuple, List, Dict, Set
 from deepface import DeepFace
 import json
-from io import BytesIO
-from PIL import Image
+from uuid import uuid4
+from database import get_supabase_client
+from db_utils import execute_with_retry
+from config import (
+    FACE_IMAGE_BUCKET,
+    YUNET_MODEL_PATH,
+    YUNET_INPUT_SIZE,
+    YUNET_SCORE_THRESHOLD,
+    YUNET_NMS_THRESHOLD,
+    YUNET_TOP_K,
+    FACE_CROP_SIZE,
+    FACE_INFERENCE_URL,
+    FACE_INFERENCE_MODEL,
+    FACE_INFERENCE_INPUT_NAME,
+    FACE_INFERENCE_OUTPUT_NAME,
+    FACE_INFERENCE_TIMEOUT_SECONDS,
+    FACE_EMBEDDING_DIM,
+    FACE_GALLERY_PAGE_SIZE,
+    FACE_GALLERY_REFRESH_SECONDS
+)
+
+QUANTIZED_EMBEDDING_PREFIX = "q8:"
+INFERENCE_DATATYPES = {"FP16": np.float16, "FP32": np.float32}
+
+try:
+    from turbojpeg import TurboJPEG, TJPF_BGR
+    turbo_jpeg = TurboJPEG()
+except (ImportError, OSError, RuntimeError):
+    turbo_jpeg = None
+
+EXIF_ORIENTATION_TRANSFORMS = {
+    2: lambda img: cv2.flip(img, 1),
+    3: lambda img: cv2.rotate(img, cv2.ROTATE_180),
+    4: lambda img: cv2.flip(img, 0),
+    5: lambda img: cv2.transpose(img),
+    6: lambda img: cv2.rotate(img, cv2.ROTATE_90_CLOCKWISE),
+    7: lambda img: cv2.flip(cv2.transpose(img), -1),
+    8: lambda img: cv2.rotate(img, cv2.ROTATE_90_COUNTERCLOCKWISE)
+}
 
 class FaceRecognitionService:
     def __init__(self, model_name: str = "Facenet512"):
         self.model_name = model_name
         self.distance_metric = "cosine"
+        self._face_cascade = cv2.CascadeClassifier(
+            cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
+        )
+        self._eye_cascade = cv2.CascadeClassifier(
+            cv2.data.haarcascades + 'haarcascade_eye.xml'
+        )
+        self._detector_lock = threading.Lock()
+        self._yunet = None
+        if hasattr(cv2, "FaceDetectorYN") and os.path.exists(YUNET_MODEL_PATH):
+            self._yunet = cv2.FaceDetectorYN.create(
+                YUNET_MODEL_PATH,
+                "",
+                (YUNET_INPUT_SIZE, YUNET_INPUT_SIZE),
+                YUNET_SCORE_THRESHOLD,
+                YUNET_NMS_THRESHOLD,
+                YUNET_TOP_K
+            )
+        else:
+            print(f"YuNet model not found at {YUNET_MODEL_PATH}, using Haar cascade face detection")
+        self._inference_client = None
+        if FACE_INFERENCE_URL:
+            self._inference_client = httpx.AsyncClient(
+                base_url=FACE_INFERENCE_URL,
+                timeout=FACE_INFERENCE_TIMEOUT_SECONDS
+            )
+        self._gallery_ids: List[str] = []
+        self._gallery_card_numbers: List[str] = []
+        self._gallery_id_set: Set[str] = set()
+        self._gallery_buffer = np.empty((0, FACE_EMBEDDING_DIM), dtype=np.float32)
+        self._gallery: Optional[np.ndarray] = None
+        self._gallery_loaded_at = 0.0
+        self._gallery_created_since: Optional[str] = None
+        self._gallery_newest_created_at: Optional[str] = None
+        self._gallery_lock: Optional[asyncio.Lock] = None
+        self._gallery_refresh_task: Optional[asyncio.Task] = None
+        self._gallery_added_during_load: Optional[List[Tuple[List[str], List[str], np.ndarray]]] = None
+
+    def load_model(self) -> None:
+        if self._inference_client is None:
+            DeepFace.build_model(self.model_name)
+
+    async def detect_and_embed(self, image_data: bytes) -> Tuple[bool, Optional[str]]:
+        return (await self.detect_and_embed_batch([image_data]))[0]
+
+    async def detect_and_embed_batch(self, images: List[bytes]) -> List[Tuple[bool, Optional[str]]]:
+        results, face_crops, face_indices = await asyncio.to_thread(self._detect_face_crops, images)
+
+        if not face_crops:
+            return results
 
-    def extract_face_embedding(self, image_data: bytes) -> Optional[str]:
         try:
-            nparr = np.frombuffer(image_data, np.uint8)
-            img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+            if self._inference_client is not None:
+                embeddings = await self._infer_embeddings(face_crops)
+            else:
+                embeddings = await asyncio.to_thread(self._represent_faces, face_crops)
+        except Exception as e:
+            print(f"Error extracting face embeddings: {str(e)}")
+            return results
+
+        for index, embedding in zip(face_indices, embeddings):
+            if embedding is not None:
+                embedding = embedding / (np.linalg.norm(embedding) + 1e-12)
+                results[index] = (True, self.serialize_embedding(embedding))
+
+        return results
+
+    def _detect_face_crops(
+        self, images: List[bytes]
+    ) -> Tuple[List[Tuple[bool, Optional[str]]], List[np.ndarray], List[int]]:
+        results: List[Tuple[bool, Optional[str]]] = [(False, None)] * len(images)
+        face_crops = []
+        face_indices = []
+
+        for index, image_data in enumerate(images):
+            try:
+                img = self._decode_image(image_data)
+                if img is None:
+                    raise ValueError(f"Failed to decode image {index}")
+
+                faces = self._detect_faces(img)
+                if not faces:
+                    continue
+
+                face, eyes = max(faces, key=lambda detection: detection[0][2] * detection[0][3])
+                face_crop = self._crop_face(img, face, eyes)
+            except Exception as e:
+                print(f"Error detecting face: {str(e)}")
+                continue
+
+            results[index] = (True, None)
+            face_crops.append(face_crop)
+            face_indices.append(index)
+
+        return results, face_crops, face_indices
+
+    def _represent_faces(self, face_crops: List[np.ndarray]) -> List[Optional[np.ndarray]]:
+        embedding_objs = DeepFace.represent(
+            img_path=face_crops,
+            model_name=self.model_name,
+            enforce_detection=False,
+            detector_backend="skip"
+        )
+        if len(face_crops) == 1:
+            embedding_objs = [embedding_objs]
 
-            if img is None:
-                raise ValueError("Failed to decode image")
+        return [
+            np.asarray(face_objs[0]["embedding"], dtype=np.float32) if face_objs else None
+            for face_objs in embedding_objs
+        ]
 
-            embedding_objs = DeepFace.represent(
-                img_path=img,
-                model_name=self.model_name,
-                enforce_detection=True,
-                detector_backend="opencv"
+    async def _infer_embeddings(self, face_crops: List[np.ndarray]) -> List[np.ndarray]:
+        batch = (np.stack(face_crops).astype(np.float32) / 255.0).astype(np.float16)
+        tensor = batch.tobytes()
+        header = json.dumps({
+            "inputs": [{
+                "name": FACE_INFERENCE_INPUT_NAME,
+                "shape": list(batch.shape),
+                "datatype": "FP16",
+                "parameters": {"binary_data_size": len(tensor)}
+            }],
+            "outputs": [{"name": FACE_INFERENCE_OUTPUT_NAME, "parameters": {"binary_data": True}}]
+        }).encode("utf-8")
+
+        async def infer() -> httpx.Response:
+            response = await self._inference_client.post(
+                f"/v2/models/{FACE_INFERENCE_MODEL}/infer",
+                content=header + tensor,
+                headers={
+                    "Content-Type": "application/octet-stream",
+                    "Inference-Header-Content-Length": str(len(header))
+                }
             )
+            response.raise_for_status()
+            return response
 
-            if embedding_objs and len(embedding_objs) > 0:
-                embedding = embedding_objs[0]["embedding"]
-                return json.dumps(embedding)
+        response = await execute_with_retry(infer)
+        header_length = int(response.headers.get("Inference-Header-Content-Length", len(response.content)))
+        output = json.loads(response.content[:header_length])["outputs"][0]
 
-            return None
-        except Exception as e:
-            print(f"Error extracting face embedding: {str(e)}")
+        dtype = INFERENCE_DATATYPES[output["datatype"]]
+
+        if "data" in output:
+            embeddings = np.asarray(output["data"], dtype=dtype)
+        else:
+            embeddings = np.frombuffer(response.content[header_length:], dtype=dtype)
+
+        return list(embeddings.reshape(len(face_crops), -1).astype(np.float32))
+
+    def _crop_face(
+        self,
+        img: np.ndarray,
+        face: Tuple[int, int, int, int],
+        eyes: Optional[List[Tuple[int, int]]] = None
+    ) -> np.ndarray:
+        x, y, w, h = face
+        height, width = img.shape[:2]
+        x1, y1 = max(0, x), max(0, y)
+        x2, y2 = min(width, x + w), min(height, y + h)
+        face_img = img[y1:y2, x1:x2]
+
+        if eyes is None:
+            eyes = self._detect_eyes(face_img)
+        else:
+            eyes = [(eye_x - x1, eye_y - y1) for eye_x, eye_y in eyes]
+
+        if eyes is not None:
+            left_eye, right_eye = sorted(eyes)
+            face_img = self._align_face(face_img, left_eye, right_eye)
+
+        return self._letterbox_face(face_img)
+
+    def _detect_eyes(self, face_img: np.ndarray) -> Optional[List[Tuple[int, int]]]:
+        gray = cv2.cvtColor(face_img, cv2.COLOR_BGR2GRAY)
+        with self._detector_lock:
+            eyes = self._eye_cascade.detectMultiScale(gray, 1.1, 10)
+        eyes = sorted(
+            eyes,
+            key=lambda eye: abs((eye[0] - eye[2]) * (eye[1] - eye[3])),
+            reverse=True
+        )
+        if len(eyes) < 2:
             return None
 
+        return [(int(x + w / 2), int(y + h / 2)) for x, y, w, h in eyes[:2]]
+
+    def _align_face(
+        self, face_img: np.ndarray, left_eye: Tuple[int, int], right_eye: Tuple[int, int]
+    ) -> np.ndarray:
+        dx, dy = right_eye[0] - left_eye[0], right_eye[1] - left_eye[1]
+        if dx == 0:
+            return face_img
+
+        height, width = face_img.shape[:2]
+        rotation = cv2.getRotationMatrix2D((width / 2, height / 2), float(np.degrees(np.arctan2(dy, dx))), 1.0)
+        return cv2.warpAffine(face_img, rotation, (width, height), flags=cv2.INTER_NEAREST)
+
+    def _letterbox_face(self, face_img: np.ndarray) -> np.ndarray:
+        height, width = face_img.shape[:2]
+        factor = FACE_CROP_SIZE / max(height, width)
+        resized = cv2.resize(face_img, (int(width * factor), int(height * factor)))
+        pad_height = FACE_CROP_SIZE - resized.shape[0]
+        pad_width = FACE_CROP_SIZE - resized.shape[1]
+        return cv2.copyMakeBorder(
+            resized,
+            pad_height // 2, pad_height - pad_height // 2,
+            pad_width // 2, pad_width - pad_width // 2,
+            cv2.BORDER_CONSTANT
+        )
+
+    def serialize_embedding(self, embedding: np.ndarray) -> str:
+        scale = float(np.abs(embedding).max()) / 127 or 1.0
+        quantized = np.round(embedding / scale).astype(np.int8)
+        payload = np.float32(scale).tobytes() + quantized.tobytes()
+        return QUANTIZED_EMBEDDING_PREFIX + base64.b64encode(payload).decode("ascii")
+
+    def deserialize_embedding(self, embedding_str: str) -> np.ndarray:
+        if embedding_str.startswith("["):
+            return np.array(json.loads(embedding_str), dtype=np.float32)
+        if embedding_str.startswith(QUANTIZED_EMBEDDING_PREFIX):
+            quantized, scale = self._deserialize_quantized_embedding(embedding_str)
+            return quantized.astype(np.float32) * np.float32(scale)
+        return np.frombuffer(base64.b64decode(embedding_str), dtype=np.float32)
+
+    def _deserialize_quantized_embedding(self, embedding_str: str) -> Tuple[np.ndarray, float]:
+        payload = base64.b64decode(embedding_str[len(QUANTIZED_EMBEDDING_PREFIX):])
+        scale = float(np.frombuffer(payload[:4], dtype=np.float32)[0])
+        return np.frombuffer(payload[4:], dtype=np.int8), scale
+
+    def embedding_to_vector(self, embedding_str: str) -> List[float]:
+        return self.deserialize_embedding(embedding_str).tolist()
+
     def compare_faces(self, embedding1_str: str, embedding2_str: str) -> Tuple[bool, float]:
         try:
-            embedding1 = np.array(json.loads(embedding1_str))
-            embedding2 = np.array(json.loads(embedding2_str))
-
-            if self.distance_metric == "cosine":
-                distance = self._cosine_distance(embedding1, embedding2)
-            elif self.distance_metric == "euclidean":
+            if self.distance_metric == "euclidean":
+                embedding1 = self.deserialize_embedding(embedding1_str)
+                embedding2 = self.deserialize_embedding(embedding2_str)
                 distance = np.linalg.norm(embedding1 - embedding2)
+            elif (
+                embedding1_str.startswith(QUANTIZED_EMBEDDING_PREFIX)
+                and embedding2_str.startswith(QUANTIZED_EMBEDDING_PREFIX)
+            ):
+                distance = self._quantized_cosine_distance(embedding1_str, embedding2_str)
             else:
+                embedding1 = self.deserialize_embedding(embedding1_str)
+                embedding2 = self.deserialize_embedding(embedding2_str)
                 distance = self._cosine_distance(embedding1, embedding2)
 
             threshold = 0.4 if self.distance_metric == "cosine" else 10
@@ -58,45 +310,246 @@ class FaceRecognitionService:
             return False, 0.0
 
     def _cosine_distance(self, embedding1: np.ndarray, embedding2: np.ndarray) -> float:
-        dot_product = np.dot(embedding1, embedding2)
-        norm1 = np.linalg.norm(embedding1)
-        norm2 = np.linalg.norm(embedding2)
+        return float(1.0 - np.dot(embedding1, embedding2))
 
-        if norm1 == 0 or norm2 == 0:
-            return 1.0
+    def _quantized_cosine_distance(self, embedding1_str: str, embedding2_str: str) -> float:
+        quantized1, scale1 = self._deserialize_quantized_embedding(embedding1_str)
+        quantized2, scale2 = self._deserialize_quantized_embedding(embedding2_str)
+        dot_product = int(np.dot(quantized1.astype(np.int32), quantized2.astype(np.int32)))
+        return 1.0 - dot_product * scale1 * scale2
 
-        cosine_similarity = dot_product / (norm1 * norm2)
-        return 1 - cosine_similarity
+    def cosine_distances_batch(self, query: np.ndarray, gallery: np.ndarray) -> np.ndarray:
+        return 1.0 - gallery @ query
 
-    def verify_face_from_image(self, image_data: bytes, stored_embedding: str) -> Tuple[bool, float]:
-        try:
-            new_embedding = self.extract_face_embedding(image_data)
+    async def find_nearest(self, embedding_str: str, k: int = 5) -> List[Dict]:
+        if self._gallery is None:
+            await asyncio.shield(self._schedule_gallery_refresh())
+        elif time.monotonic() - self._gallery_loaded_at > FACE_GALLERY_REFRESH_SECONDS:
+            self._schedule_gallery_refresh()
+        ids, card_numbers, gallery = self._gallery_ids, self._gallery_card_numbers, self._gallery
 
-            if new_embedding is None:
-                return False, 0.0
+        if gallery is None or len(gallery) == 0:
+            return []
 
-            is_match, confidence = self.compare_faces(new_embedding, stored_embedding)
-            return is_match, confidence
-        except Exception as e:
-            print(f"Error verifying face: {str(e)}")
-            return False, 0.0
+        query = self.deserialize_embedding(embedding_str)
+        distances = await asyncio.to_thread(self.cosine_distances_batch, query, gallery)
+
+        k = min(k, len(gallery))
+        nearest = np.argpartition(distances, k - 1)[:k]
+        nearest = nearest[np.argsort(distances[nearest])]
+
+        return [
+            {"id": ids[i], "card_number": card_numbers[i], "distance": float(distances[i])}
+            for i in nearest
+        ]
+
+    def add_to_gallery(self, rows: List[Tuple[str, str, str]]) -> None:
+        if not rows:
+            return
+
+        ids = [beneficiary_id for beneficiary_id, _, _ in rows]
+        card_numbers = [card_number for _, card_number, _ in rows]
+        embeddings = np.array(
+            [self.deserialize_embedding(embedding_str) for _, _, embedding_str in rows], dtype=np.float32
+        )
+
+        if self._gallery is None:
+            if self._gallery_added_during_load is not None:
+                self._gallery_added_during_load.append((ids, card_numbers, embeddings))
+            return
+
+        self._append_to_gallery(ids, card_numbers, embeddings)
 
-    def detect_face_in_image(self, image_data: bytes) -> bool:
+    def _append_to_gallery(self, ids: List[str], card_numbers: List[str], embeddings: np.ndarray) -> None:
+        new_rows = []
+        for index, beneficiary_id in enumerate(ids):
+            if beneficiary_id not in self._gallery_id_set:
+                self._gallery_id_set.add(beneficiary_id)
+                new_rows.append(index)
+
+        if not new_rows:
+            return
+        if len(new_rows) < len(ids):
+            embeddings = embeddings[new_rows]
+
+        size, count = len(self._gallery_ids), len(new_rows)
+        if size == 0:
+            self._gallery_buffer = embeddings
+        else:
+            if size + count > len(self._gallery_buffer):
+                buffer = np.empty(
+                    (max(2 * len(self._gallery_buffer), size + count), FACE_EMBEDDING_DIM), dtype=np.float32
+                )
+                buffer[:size] = self._gallery_buffer[:size]
+                self._gallery_buffer = buffer
+            self._gallery_buffer[size:size + count] = embeddings
+
+        self._gallery_ids.extend(ids[index] for index in new_rows)
+        self._gallery_card_numbers.extend(card_numbers[index] for index in new_rows)
+        self._gallery = self._gallery_buffer[:size + count]
+
+    def _schedule_gallery_refresh(self) -> asyncio.Task:
+        if self._gallery_refresh_task is None or self._gallery_refresh_task.done():
+            self._gallery_refresh_task = asyncio.create_task(self._refresh_gallery())
+        return self._gallery_refresh_task
+
+    async def _refresh_gallery(self) -> None:
         try:
-            nparr = np.frombuffer(image_data, np.uint8)
-            img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+            await self.load_gallery()
+        except Exception as e:
+            print(f"Error refreshing face gallery: {str(e)}")
+
+    async def load_gallery(self) -> None:
+        if self._gallery_lock is None:
+            self._gallery_lock = asyncio.Lock()
+
+        async with self._gallery_lock:
+            self._gallery_added_during_load = []
+            try:
+                ids, card_numbers, embeddings, newest_created_at = await self._fetch_gallery(
+                    self._gallery_created_since
+                )
+            finally:
+                added_during_load, self._gallery_added_during_load = self._gallery_added_during_load, None
 
-            if img is None:
-                return False
+            if self._gallery is None:
+                self._gallery = self._gallery_buffer
+            self._append_to_gallery(ids, card_numbers, embeddings)
+            for rows in added_during_load:
+                self._append_to_gallery(*rows)
+
+            self._gallery_created_since = self._gallery_newest_created_at or newest_created_at
+            self._gallery_newest_created_at = max(
+                filter(None, [self._gallery_newest_created_at, newest_created_at]), default=None
+            )
+            self._gallery_loaded_at = time.monotonic()
 
-            face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-            faces = face_cascade.detectMultiScale(gray, 1.3, 5)
+    async def _fetch_gallery(
+        self, created_since: Optional[str] = None
+    ) -> Tuple[List[str], List[str], np.ndarray, Optional[str]]:
+        supabase = get_supabase_client()
+        ids, card_numbers, pages = [], [], []
+        newest_created_at = None
+        last_id = None
 
-            return len(faces) > 0
+        while True:
+            query = supabase.table("beneficiaries").select(
+                "id, card_number, face_embedding, created_at"
+            ).not_.is_("face_embedding", "null")
+            if created_since is not None:
+                query = query.gte("created_at", created_since)
+            if last_id is not None:
+                query = query.gt("id", last_id)
+            response = await execute_with_retry(query.order("id").limit(FACE_GALLERY_PAGE_SIZE).execute)
+            rows = response.data or []
+
+            page_ids, page_card_numbers, page_embeddings = await asyncio.to_thread(self._parse_gallery_rows, rows)
+            ids.extend(page_ids)
+            card_numbers.extend(page_card_numbers)
+            pages.append(page_embeddings)
+            newest_created_at = max(
+                filter(None, [newest_created_at] + [row.get("created_at") for row in rows]), default=None
+            )
+
+            if len(rows) < FACE_GALLERY_PAGE_SIZE:
+                break
+            last_id = rows[-1]["id"]
+
+        embeddings = pages[0] if len(pages) == 1 else await asyncio.to_thread(np.vstack, pages)
+        return ids, card_numbers, embeddings, newest_created_at
+
+    def _parse_gallery_rows(self, rows: List[Dict]) -> Tuple[List[str], List[str], np.ndarray]:
+        ids, card_numbers, embeddings = [], [], []
+        for row in rows:
+            try:
+                embedding = self.deserialize_embedding(row["face_embedding"])
+            except Exception:
+                continue
+            if embedding.shape != (FACE_EMBEDDING_DIM,):
+                continue
+            ids.append(row["id"])
+            card_numbers.append(row["card_number"])
+            embeddings.append(embedding)
+
+        if not embeddings:
+            return ids, card_numbers, np.empty((0, FACE_EMBEDDING_DIM), dtype=np.float32)
+        return ids, card_numbers, np.array(embeddings, dtype=np.float32)
+
+    def _decode_image(self, image_data: bytes) -> Optional[np.ndarray]:
+        if turbo_jpeg is not None and image_data.startswith(b"\xff\xd8"):
+            try:
+                img = turbo_jpeg.decode(image_data, pixel_format=TJPF_BGR)
+                transform = EXIF_ORIENTATION_TRANSFORMS.get(self._exif_orientation(image_data))
+                return transform(img) if transform else img
+            except Exception as e:
+                print(f"Error decoding JPEG with TurboJPEG, falling back to OpenCV: {str(e)}")
+
+        return cv2.imdecode(np.frombuffer(image_data, np.uint8), cv2.IMREAD_COLOR)
+
+    def _exif_orientation(self, image_data: bytes) -> int:
+        offset = 2
+        while offset + 4 <= len(image_data) and image_data[offset] == 0xFF:
+            marker = image_data[offset + 1]
+            length = int.from_bytes(image_data[offset + 2:offset + 4], "big")
+            if marker == 0xDA:
+                break
+            if marker == 0xE1 and image_data[offset + 4:offset + 10] == b"Exif\x00\x00":
+                tiff = image_data[offset + 10:offset + 2 + length]
+                byte_order = "little" if tiff[:2] == b"II" else "big"
+                ifd = int.from_bytes(tiff[4:8], byte_order)
+                for index in range(int.from_bytes(tiff[ifd:ifd + 2], byte_order)):
+                    entry = tiff[ifd + 2 + 12 * index:ifd + 14 + 12 * index]
+                    if int.from_bytes(entry[:2], byte_order) == 0x0112:
+                        return int.from_bytes(entry[8:10], byte_order)
+                return 1
+            offset += 2 + length
+        return 1
+
+    def _detect_faces(
+        self, img: np.ndarray
+    ) -> List[Tuple[Tuple[int, int, int, int], Optional[List[Tuple[int, int]]]]]:
+        if self._yunet is None:
+            with self._detector_lock:
+                faces = self._face_cascade.detectMultiScale(img, 1.1, 10)
+            return [(tuple(int(v) for v in face), None) for face in faces]
+
+        height, width = img.shape[:2]
+        scale = YUNET_INPUT_SIZE / max(height, width)
+        resized = cv2.resize(img, (round(width * scale), round(height * scale)))
+        letterboxed = cv2.copyMakeBorder(
+            resized,
+            0, YUNET_INPUT_SIZE - resized.shape[0],
+            0, YUNET_INPUT_SIZE - resized.shape[1],
+            cv2.BORDER_CONSTANT
+        )
+
+        with self._detector_lock:
+            _, faces = self._yunet.detect(letterboxed)
+        if faces is None:
+            return []
+
+        return [
+            (
+                tuple(int(round(v / scale)) for v in face[:4]),
+                [(int(round(face[i] / scale)), int(round(face[i + 1] / scale))) for i in (4, 6)]
+            )
+            for face in faces
+        ]
+
+    async def upload_image(self, image_data: bytes) -> Optional[str]:
+        try:
+            if image_data.startswith(b"\x89PNG"):
+                path, content_type = f"{uuid4()}.png", "image/png"
+            else:
+                path, content_type = f"{uuid4()}.jpg", "image/jpeg"
+
+            await execute_with_retry(lambda: get_supabase_client().storage.from_(FACE_IMAGE_BUCKET).upload(
+                path, image_data, {"content-type": content_type, "upsert": "true"}
+            ))
+            return path
         except Exception as e:
-            print(f"Error detecting face: {str(e)}")
-            return False
+            print(f"Error uploading image: {str(e)}")
+            return None
 
     def base64_to_bytes(self, base64_string: str) -> bytes:
         if ',' in base64_string:
@@ -3,20 +3,33 @@ from fastapi.middleware.cors import CORSMiddleware
 from typing import Optional, List
 import base64
 from datetime import datetime
+from uuid import uuid4
 import json
+import asyncio
+from cachetools import TTLCache
 
 from models import (
     BeneficiaryCreate,
+    BulkBeneficiaryCreate,
     BeneficiaryResponse,
     VerificationRequest,
     VerificationResponse,
     TransactionResponse,
     DuplicateAlertResponse
 )
-from database import get_supabase_client
+from database import get_supabase_client, cached_supabase_request
+from db_utils import execute_with_retry
 from face_recognition_service import face_service
 from duplicate_detection import duplicate_service
-from config import FACE_MATCH_THRESHOLD
+from config import (
+    FACE_MATCH_THRESHOLD,
+    BENEFICIARY_CACHE_SIZE,
+    BENEFICIARY_CACHE_TTL_SECONDS,
+    ACTIVE_CYCLE_CACHE_TTL_SECONDS,
+    DASHBOARD_STATS_CACHE_TTL_SECONDS,
+    BULK_REGISTRATION_BATCH_SIZE,
+    UVICORN_WORKERS
+)
 
 app = FastAPI(title="BPL Card Duplicate Detection System")
 
@@ -30,6 +43,44 @@ app.add_middleware(
 
 supabase = get_supabase_client()
 
+beneficiary_cache = TTLCache(maxsize=BENEFICIARY_CACHE_SIZE, ttl=BENEFICIARY_CACHE_TTL_SECONDS)
+active_cycle_cache = TTLCache(maxsize=1, ttl=ACTIVE_CYCLE_CACHE_TTL_SECONDS)
+dashboard_stats_cache = TTLCache(maxsize=1, ttl=DASHBOARD_STATS_CACHE_TTL_SECONDS)
+
+BENEFICIARY_COLUMNS = "id, card_number, name, phone, address, face_image_url, face_embedding, status, created_at, updated_at"
+
+def without_embedding_vector(row: dict) -> dict:
+    return {key: value for key, value in row.items() if key != "face_embedding_v"}
+
+async def get_beneficiary(card_number: str) -> Optional[dict]:
+    async def fetch_beneficiary() -> Optional[dict]:
+        response = await execute_with_retry(supabase.table("beneficiaries").select(BENEFICIARY_COLUMNS).eq(
+            "card_number", card_number
+        ).maybe_single().execute)
+        return response.data if response else None
+
+    return await cached_supabase_request(beneficiary_cache, card_number, fetch_beneficiary)
+
+async def get_active_cycle_id() -> Optional[str]:
+    async def fetch_active_cycle_id() -> Optional[str]:
+        response = await execute_with_retry(supabase.table("distribution_cycles").select("id").eq(
+            "status", "active"
+        ).maybe_single().execute)
+        return response.data["id"] if response and response.data else None
+
+    return await cached_supabase_request(active_cycle_cache, "active", fetch_active_cycle_id)
+
+@app.on_event("startup")
+async def load_face_model():
+    await asyncio.to_thread(face_service.load_model)
+
+@app.on_event("startup")
+async def load_face_gallery():
+    try:
+        await face_service.load_gallery()
+    except Exception as e:
+        print(f"Error loading face gallery: {str(e)}")
+
 @app.get("/")
 def read_root():
     return {
@@ -41,20 +92,19 @@ def read_root():
 @app.post("/api/beneficiaries", response_model=dict)
 async def register_beneficiary(beneficiary: BeneficiaryCreate):
     try:
-        existing = supabase.table("beneficiaries").select("id").eq(
+        existing = await execute_with_retry(supabase.table("beneficiaries").select("id").eq(
             "card_number", beneficiary.card_number
-        ).execute()
+        ).execute)
 
         if existing.data:
             raise HTTPException(status_code=400, detail="Card number already registered")
 
         image_data = face_service.base64_to_bytes(beneficiary.face_image_base64)
 
-        has_face = face_service.detect_face_in_image(image_data)
+        has_face, face_embedding = await face_service.detect_and_embed(image_data)
         if not has_face:
             raise HTTPException(status_code=400, detail="No face detected in image")
 
-        face_embedding = face_service.extract_face_embedding(image_data)
         if not face_embedding:
             raise HTTPException(status_code=400, detail="Could not extract face features")
 
@@ -63,18 +113,24 @@ async def register_beneficiary(beneficiary: BeneficiaryCreate):
             "name": beneficiary.name,
             "phone": beneficiary.phone,
             "address": beneficiary.address,
-            "face_image_url": beneficiary.face_image_base64[:100] + "...",
+            "face_image_url": await face_service.upload_image(image_data),
             "face_embedding": face_embedding,
-            "status": "active"
+            "face_embedding_v": face_service.embedding_to_vector(face_embedding),
+            "status": "active",
+            "idempotency_key": str(uuid4())
         }
 
-        response = supabase.table("beneficiaries").insert(beneficiary_data).execute()
+        response = await execute_with_retry(supabase.table("beneficiaries").upsert(
+            beneficiary_data, on_conflict="idempotency_key"
+        ).execute)
 
         if response.data:
+            beneficiary_cache.pop(beneficiary.card_number, None)
+            face_service.add_to_gallery([(response.data[0]["id"], beneficiary.card_number, face_embedding)])
             return {
                 "success": True,
                 "message": "Beneficiary registered successfully",
-                "beneficiary": response.data[0]
+                "beneficiary": without_embedding_vector(response.data[0])
             }
         else:
             raise HTTPException(status_code=500, detail="Failed to register beneficiary")
@@ -84,15 +140,117 @@ async def register_beneficiary(beneficiary: BeneficiaryCreate):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/beneficiaries/bulk", response_model=dict)
+async def register_beneficiaries_bulk(request: BulkBeneficiaryCreate):
+    try:
+        card_numbers = [beneficiary.card_number for beneficiary in request.beneficiaries]
+
+        existing = await execute_with_retry(supabase.table("beneficiaries").select("card_number").in_(
+            "card_number", card_numbers
+        ).execute)
+        taken_card_numbers = {row["card_number"] for row in existing.data or []}
+
+        failed = []
+        candidates = []
+        for beneficiary in request.beneficiaries:
+            if beneficiary.card_number in taken_card_numbers:
+                failed.append({
+                    "card_number": beneficiary.card_number,
+                    "detail": "Card number already registered"
+                })
+                continue
+
+            try:
+                image_data = face_service.base64_to_bytes(beneficiary.face_image_base64)
+            except Exception:
+                failed.append({
+                    "card_number": beneficiary.card_number,
+                    "detail": "Invalid image data"
+                })
+                continue
+
+            taken_card_numbers.add(beneficiary.card_number)
+            candidates.append((beneficiary, image_data))
+
+        accepted = []
+        for start in range(0, len(candidates), BULK_REGISTRATION_BATCH_SIZE):
+            batch = candidates[start:start + BULK_REGISTRATION_BATCH_SIZE]
+            face_results = await face_service.detect_and_embed_batch([image_data for _, image_data in batch])
+
+            batch_accepted = []
+            for (beneficiary, image_data), (has_face, face_embedding) in zip(batch, face_results):
+                if not has_face:
+                    failed.append({
+                        "card_number": beneficiary.card_number,
+                        "detail": "No face detected in image"
+                    })
+                    continue
+
+                if not face_embedding:
+                    failed.append({
+                        "card_number": beneficiary.card_number,
+                        "detail": "Could not extract face features"
+                    })
+                    continue
+
+                batch_accepted.append((beneficiary, image_data, face_embedding))
+
+            image_paths = await asyncio.gather(*(
+                face_service.upload_image(image_data) for _, image_data, _ in batch_accepted
+            ))
+            accepted.extend(
+                (beneficiary, face_embedding, image_path)
+                for (beneficiary, _, face_embedding), image_path in zip(batch_accepted, image_paths)
+            )
+
+        beneficiary_rows = [
+            {
+                "card_number": beneficiary.card_number,
+                "name": beneficiary.name,
+                "phone": beneficiary.phone,
+                "address": beneficiary.address,
+                "face_image_url": image_path,
+                "face_embedding": face_embedding,
+                "face_embedding_v": face_service.embedding_to_vector(face_embedding),
+                "status": "active",
+                "idempotency_key": str(uuid4())
+            }
+            for beneficiary, face_embedding, image_path in accepted
+        ]
+
+        registered = []
+        if beneficiary_rows:
+            response = await execute_with_retry(supabase.table("beneficiaries").upsert(
+                beneficiary_rows, on_conflict="idempotency_key"
+            ).execute)
+            registered = [without_embedding_vector(row) for row in response.data or []]
+            for row in registered:
+                beneficiary_cache.pop(row["card_number"], None)
+            face_service.add_to_gallery(
+                [(row["id"], row["card_number"], row["face_embedding"]) for row in registered]
+            )
+
+        return {
+            "success": not failed,
+            "message": f"Registered {len(registered)} of {len(request.beneficiaries)} beneficiaries",
+            "beneficiaries": registered,
+            "failed": failed
+        }
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/api/beneficiaries", response_model=List[dict])
 async def get_all_beneficiaries(status: Optional[str] = None, limit: int = 100):
     try:
-        query = supabase.table("beneficiaries").select("*")
+        query = supabase.table("beneficiaries").select(
+            "id, card_number, name, phone, address, face_image_url, status, created_at, updated_at"
+        )
 
         if status:
             query = query.eq("status", status)
 
-        response = query.order("created_at", desc=True).limit(limit).execute()
+        response = await execute_with_retry(query.order("created_at", desc=True).limit(limit).execute)
         return response.data
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -100,14 +258,12 @@ async def get_all_beneficiaries(status: Optional[str] = None, limit: int = 100):
 @app.get("/api/beneficiaries/{card_number}", response_model=dict)
 async def get_beneficiary_by_card(card_number: str):
     try:
-        response = supabase.table("beneficiaries").select("*").eq(
-            "card_number", card_number
-        ).maybeSingle().execute()
+        beneficiary = await get_beneficiary(card_number)
 
-        if not response.data:
+        if not beneficiary:
             raise HTTPException(status_code=404, detail="Beneficiary not found")
 
-        return response.data
+        return beneficiary
     except HTTPException:
         raise
     except Exception as e:
@@ -116,19 +272,15 @@ async def get_beneficiary_by_card(card_number: str):
 @app.post("/api/verify", response_model=VerificationResponse)
 async def verify_beneficiary(verification: VerificationRequest):
     try:
-        beneficiary_response = supabase.table("beneficiaries").select("*").eq(
-            "card_number", verification.card_number
-        ).maybeSingle().execute()
+        beneficiary = await get_beneficiary(verification.card_number)
 
-        if not beneficiary_response.data:
+        if not beneficiary:
             return VerificationResponse(
                 success=False,
                 message="Card number not found in system",
                 alerts=[]
             )
 
-        beneficiary = beneficiary_response.data
-
         if beneficiary["status"] != "active":
             return VerificationResponse(
                 success=False,
@@ -139,9 +291,12 @@ async def verify_beneficiary(verification: VerificationRequest):
 
         captured_image_data = face_service.base64_to_bytes(verification.captured_image_base64)
 
-        is_match, confidence = face_service.verify_face_from_image(
-            captured_image_data,
-            beneficiary["face_embedding"]
+        _, captured_embedding = await face_service.detect_and_embed(captured_image_data)
+
+        is_match, confidence = (
+            face_service.compare_faces(captured_embedding, beneficiary["face_embedding"])
+            if captured_embedding
+            else (False, 0.0)
         )
 
         if not is_match or confidence < (FACE_MATCH_THRESHOLD * 100):
@@ -157,17 +312,17 @@ async def verify_beneficiary(verification: VerificationRequest):
                 }]
             )
 
-        active_cycle = supabase.table("distribution_cycles").select("id").eq(
-            "status", "active"
-        ).maybeSingle().execute()
-
-        cycle_id = active_cycle.data["id"] if active_cycle.data else None
+        cycle_id = await get_active_cycle_id()
 
-        duplicate_alerts = duplicate_service.check_duplicate_attempts(
-            beneficiary["id"],
-            verification.card_number,
-            verification.shop_id,
-            cycle_id
+        captured_image_path, duplicate_alerts = await asyncio.gather(
+            face_service.upload_image(captured_image_data),
+            duplicate_service.check_duplicate_attempts(
+                beneficiary["id"],
+                verification.card_number,
+                verification.shop_id,
+                cycle_id,
+                captured_embedding
+            )
         )
 
         transaction_data = {
@@ -177,27 +332,29 @@ async def verify_beneficiary(verification: VerificationRequest):
             "cycle_id": cycle_id,
             "verification_type": "face",
             "face_match_confidence": confidence,
-            "captured_image_url": verification.captured_image_base64[:100] + "...",
+            "captured_image_url": captured_image_path,
             "status": "flagged" if duplicate_alerts else "success",
             "items_collected": json.dumps(verification.items_collected),
-            "operator_id": verification.operator_id
+            "operator_id": verification.operator_id,
+            "idempotency_key": str(uuid4())
         }
 
-        transaction_response = supabase.table("transactions").insert(transaction_data).execute()
+        transaction_response = await execute_with_retry(supabase.table("transactions").upsert(
+            transaction_data, on_conflict="idempotency_key"
+        ).execute)
 
         if duplicate_alerts and transaction_response.data:
             transaction_id = transaction_response.data[0]["id"]
-            for alert in duplicate_alerts:
-                duplicate_service.create_alert(
-                    alert_type=alert["alert_type"],
-                    beneficiary_id=beneficiary["id"],
-                    card_number=verification.card_number,
-                    transaction_id=transaction_id,
-                    shop_id=verification.shop_id,
-                    description=alert["description"],
-                    severity=alert["severity"],
-                    previous_transaction_id=alert.get("previous_transaction_id")
-                )
+            await duplicate_service.create_alerts_bulk([
+                {
+                    **alert,
+                    "beneficiary_id": beneficiary["id"],
+                    "card_number": verification.card_number,
+                    "transaction_id": transaction_id,
+                    "shop_id": verification.shop_id
+                }
+                for alert in duplicate_alerts
+            ])
 
         return VerificationResponse(
             success=True,
@@ -221,7 +378,10 @@ async def get_transactions(
 ):
     try:
         query = supabase.table("transactions").select(
-            "*, beneficiaries(name, card_number), ration_shops(name, shop_code)"
+            "id, beneficiary_id, card_number, shop_id, cycle_id, verification_type, "
+            "face_match_confidence, captured_image_url, status, items_collected, "
+            "operator_id, notes, created_at, "
+            "beneficiaries(name, card_number), ration_shops(name, shop_code)"
         )
 
         if shop_id:
@@ -229,7 +389,7 @@ async def get_transactions(
         if status:
             query = query.eq("status", status)
 
-        response = query.order("created_at", desc=True).limit(limit).execute()
+        response = await execute_with_retry(query.order("created_at", desc=True).limit(limit).execute)
         return response.data
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -250,7 +410,7 @@ async def get_alerts(
         if severity:
             query = query.eq("severity", severity)
 
-        response = query.order("created_at", desc=True).limit(limit).execute()
+        response = await execute_with_retry(query.order("created_at", desc=True).limit(limit).execute)
         return response.data
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -264,9 +424,9 @@ async def review_alert(alert_id: str, status: str, reviewed_by: str):
             "reviewed_at": datetime.now().isoformat()
         }
 
-        response = supabase.table("duplicate_alerts").update(update_data).eq(
+        response = await execute_with_retry(supabase.table("duplicate_alerts").update(update_data).eq(
             "id", alert_id
-        ).execute()
+        ).execute)
 
         if response.data:
             return {"success": True, "message": "Alert reviewed successfully"}
@@ -280,7 +440,7 @@ async def review_alert(alert_id: str, status: str, reviewed_by: str):
 @app.get("/api/shops", response_model=List[dict])
 async def get_ration_shops():
     try:
-        response = supabase.table("ration_shops").select("*").execute()
+        response = await execute_with_retry(supabase.table("ration_shops").select("*").execute)
         return response.data
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -288,41 +448,30 @@ async def get_ration_shops():
 @app.get("/api/dashboard/stats")
 async def get_dashboard_stats():
     try:
-        total_beneficiaries = supabase.table("beneficiaries").select(
-            "id", count="exact"
-        ).execute()
-
-        active_beneficiaries = supabase.table("beneficiaries").select(
-            "id", count="exact"
-        ).eq("status", "active").execute()
-
-        total_transactions = supabase.table("transactions").select(
-            "id", count="exact"
-        ).execute()
-
-        flagged_transactions = supabase.table("transactions").select(
-            "id", count="exact"
-        ).eq("status", "flagged").execute()
-
-        pending_alerts = supabase.table("duplicate_alerts").select(
-            "id", count="exact"
-        ).eq("status", "pending").execute()
+        async def fetch_dashboard_stats() -> Optional[dict]:
+            response = await execute_with_retry(supabase.rpc("get_dashboard_stats").execute)
+            return response.data
 
-        critical_alerts = supabase.table("duplicate_alerts").select(
-            "id", count="exact"
-        ).eq("severity", "critical").eq("status", "pending").execute()
+        stats = await cached_supabase_request(dashboard_stats_cache, "stats", fetch_dashboard_stats) or {}
 
         return {
-            "total_beneficiaries": total_beneficiaries.count or 0,
-            "active_beneficiaries": active_beneficiaries.count or 0,
-            "total_transactions": total_transactions.count or 0,
-            "flagged_transactions": flagged_transactions.count or 0,
-            "pending_alerts": pending_alerts.count or 0,
-            "critical_alerts": critical_alerts.count or 0
+            "total_beneficiaries": stats.get("total_beneficiaries") or 0,
+            "active_beneficiaries": stats.get("active_beneficiaries") or 0,
+            "total_transactions": stats.get("total_transactions") or 0,
+            "flagged_transactions": stats.get("flagged_transactions") or 0,
+            "pending_alerts": stats.get("pending_alerts") or 0,
+            "critical_alerts": stats.get("critical_alerts") or 0
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=8000,
+        workers=UVICORN_WORKERS,
+        loop="auto",
+        http="auto"
+    )
@@ -1,6 +1,7 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional, List
 from datetime import datetime
+from config import BULK_REGISTRATION_MAX_BENEFICIARIES
 
 class BeneficiaryCreate(BaseModel):
     card_number: str
@@ -9,6 +10,9 @@ class BeneficiaryCreate(BaseModel):
     address: Optional[str] = None
     face_image_base64: str
 
+class BulkBeneficiaryCreate(BaseModel):
+    beneficiaries: List[BeneficiaryCreate] = Field(max_length=BULK_REGISTRATION_MAX_BENEFICIARIES)
+
 class BeneficiaryResponse(BaseModel):
     id: str
     card_number: str
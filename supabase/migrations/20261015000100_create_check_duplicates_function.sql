@@ -0,0 +1,115 @@
+/*
+  # Consolidated duplicate detection check
+
+  ## Overview
+  Adds a single RPC that evaluates every duplicate-detection rule for a
+  verification attempt in one round-trip, instead of one query per rule.
+
+  ## New Functions
+
+  ### `check_duplicates(p_beneficiary_id, p_card_number, p_shop_id, p_cycle_id)`
+  Returns one row per triggered rule with the same shape the backend stores
+  in `duplicate_alerts`:
+  - `alert_type` (text) - different_person/duplicate_location/multiple_attempts/suspicious_timing
+  - `description` (text) - Human readable alert description
+  - `severity` (text) - medium/high/critical
+  - `previous_transaction_id` (uuid) - Conflicting transaction
+
+  Rules (mirroring `DuplicateDetectionService` in the backend):
+  - different_person: one of the last 5 transactions on the card belongs to another beneficiary
+  - duplicate_location: one of the last 10 successful transactions in the cycle was at another shop
+  - multiple_attempts: more than one successful transaction in the cycle
+  - suspicious_timing: any transaction by the beneficiary in the last 2 hours
+
+  When `p_cycle_id` is NULL the cycle filter is skipped.
+*/
+
+CREATE OR REPLACE FUNCTION check_duplicates(
+  p_beneficiary_id uuid,
+  p_card_number text,
+  p_shop_id uuid,
+  p_cycle_id uuid DEFAULT NULL
+)
+RETURNS TABLE (
+  alert_type text,
+  description text,
+  severity text,
+  previous_transaction_id uuid
+)
+LANGUAGE sql
+STABLE
+AS $$
+  WITH same_card_different_person AS (
+    SELECT recent.id
+    FROM (
+      SELECT t.id, t.beneficiary_id, t.created_at
+      FROM transactions t
+      WHERE t.card_number = p_card_number
+      ORDER BY t.created_at DESC
+      LIMIT 5
+    ) recent
+    WHERE recent.beneficiary_id IS DISTINCT FROM p_beneficiary_id
+    ORDER BY recent.created_at DESC
+    LIMIT 1
+  ),
+  duplicate_location AS (
+    SELECT recent.id
+    FROM (
+      SELECT t.id, t.shop_id, t.created_at
+      FROM transactions t
+      WHERE t.beneficiary_id = p_beneficiary_id
+        AND t.status = 'success'
+        AND (p_cycle_id IS NULL OR t.cycle_id = p_cycle_id)
+      ORDER BY t.created_at DESC
+      LIMIT 10
+    ) recent
+    WHERE recent.shop_id IS DISTINCT FROM p_shop_id
+    ORDER BY recent.created_at DESC
+    LIMIT 1
+  ),
+  multiple_attempts AS (
+    SELECT
+      count(*) AS attempts,
+      (array_agg(t.id ORDER BY t.created_at DESC))[1] AS id
+    FROM transactions t
+    WHERE t.beneficiary_id = p_beneficiary_id
+      AND t.status = 'success'
+      AND (p_cycle_id IS NULL OR t.cycle_id = p_cycle_id)
+    HAVING count(*) > 1
+  ),
+  suspicious_timing AS (
+    SELECT t.id, extract(epoch FROM now() - t.created_at) / 3600 AS hours_diff
+    FROM transactions t
+    WHERE t.beneficiary_id = p_beneficiary_id
+      AND t.created_at > now() - interval '2 hours'
+    ORDER BY t.created_at DESC
+    LIMIT 1
+  )
+  SELECT
+    'different_person',
+    format('Card %s was used by a different person in previous transaction', p_card_number),
+    'critical',
+    id
+  FROM same_card_different_person
+  UNION ALL
+  SELECT
+    'duplicate_location',
+    'Beneficiary already collected rations from a different shop in this cycle',
+    'high',
+    id
+  FROM duplicate_location
+  UNION ALL
+  SELECT
+    'multiple_attempts',
+    format('Beneficiary has %s transactions in current cycle', attempts),
+    'high',
+    id
+  FROM multiple_attempts
+  UNION ALL
+  SELECT
+    'suspicious_timing',
+    format('Multiple transactions within %s hours', round(hours_diff::numeric, 1)),
+    'medium',
+    id
+  FROM suspicious_timing;
+$$;
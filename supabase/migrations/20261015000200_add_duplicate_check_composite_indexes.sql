@@ -0,0 +1,43 @@
+/*
+  # Composite indexes for duplicate detection and alert listing
+
+  ## Overview
+  The duplicate checks filter `transactions` on equality columns and then
+  read the newest rows (`ORDER BY created_at DESC LIMIT n`). These composite
+  indexes put the equality columns first and `created_at DESC` last so each
+  check is answered by a single index range scan instead of a sort over all
+  matching rows.
+
+  ## New Indexes
+  - `transactions (card_number, created_at DESC)` - same card, different person
+  - `transactions (beneficiary_id, status, cycle_id, created_at DESC)` - duplicate location / multiple attempts
+  - `transactions (beneficiary_id, created_at DESC)` - suspicious timing
+  - `duplicate_alerts (status, severity, created_at DESC)` - `/api/alerts` filtering
+
+  ## Removed Indexes
+  Single-column indexes that are now a leftmost prefix of a composite index:
+  - `idx_transactions_card_number`
+  - `idx_transactions_beneficiary_id`
+  - `idx_duplicate_alerts_status`
+
+  ## Notes
+  Migrations run inside a transaction, so `CREATE INDEX CONCURRENTLY` cannot
+  be used here. On a large production table, run the statements below by hand
+  with `CONCURRENTLY` first; `IF NOT EXISTS` then makes this migration a no-op.
+*/
+
+CREATE INDEX IF NOT EXISTS idx_transactions_card_number_created_at
+  ON transactions (card_number, created_at DESC);
+
+CREATE INDEX IF NOT EXISTS idx_transactions_beneficiary_status_cycle_created_at
+  ON transactions (beneficiary_id, status, cycle_id, created_at DESC);
+
+CREATE INDEX IF NOT EXISTS idx_transactions_beneficiary_created_at
+  ON transactions (beneficiary_id, created_at DESC);
+
+CREATE INDEX IF NOT EXISTS idx_duplicate_alerts_status_severity_created_at
+  ON duplicate_alerts (status, severity, created_at DESC);
+
+DROP INDEX IF EXISTS idx_transactions_card_number;
+DROP INDEX IF EXISTS idx_transactions_beneficiary_id;
+DROP INDEX IF EXISTS idx_duplicate_alerts_status;
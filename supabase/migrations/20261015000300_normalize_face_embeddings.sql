@@ -0,0 +1,33 @@
+/*
+  # Normalize stored face embeddings
+
+  ## Overview
+  The backend now stores L2-normalized face embeddings and computes cosine
+  distance as `1 - dot(a, b)`, which is only correct for unit vectors. This
+  migration rescales embeddings registered before that change to unit length
+  so existing beneficiaries keep verifying correctly.
+
+  ## Changes
+  - `beneficiaries.face_embedding` - JSON arrays are divided by their L2 norm
+
+  ## Notes
+  Rows whose `face_embedding` is not a JSON array are left untouched.
+  Normalizing an already normalized embedding is a no-op, so re-running is safe.
+*/
+
+WITH norms AS (
+  SELECT b.id, sqrt(sum(power(e.value::float8, 2))) AS norm
+  FROM beneficiaries b,
+    json_array_elements_text(b.face_embedding::json) AS e(value)
+  WHERE b.face_embedding LIKE '[%'
+  GROUP BY b.id
+)
+UPDATE beneficiaries b
+SET face_embedding = (
+  SELECT json_agg(e.value::float8 / n.norm ORDER BY e.ordinality)::text
+  FROM json_array_elements_text(b.face_embedding::json)
+    WITH ORDINALITY AS e(value, ordinality)
+)
+FROM norms n
+WHERE b.id = n.id
+  AND n.norm > 0;
@@ -0,0 +1,54 @@
+/*
+  # pgvector face embeddings
+
+  ## Overview
+  The backend now stores `face_embedding` as base64-encoded float32 bytes
+  instead of a JSON array of numbers (4x smaller, decoded without parsing).
+  Base64 text cannot be searched in SQL, so each embedding is also stored in
+  a pgvector column for server-side nearest-neighbour search.
+
+  ## Changes
+  - Enables the `vector` extension
+  - `beneficiaries.face_embedding_v` (vector(512)) - Unit-norm Facenet512 embedding
+  - HNSW index on `face_embedding_v` using cosine distance
+  - Backfills `face_embedding_v` from JSON-encoded `face_embedding` rows
+
+  ## New Functions
+
+  ### `match_beneficiary_faces(query_embedding, match_count)`
+  Returns the `match_count` beneficiaries closest to `query_embedding`:
+  - `id` (uuid) - Beneficiary identifier
+  - `card_number` (text) - BPL card number
+  - `distance` (float8) - Cosine distance (0 = identical)
+*/
+
+CREATE EXTENSION IF NOT EXISTS vector WITH SCHEMA extensions;
+
+ALTER TABLE beneficiaries ADD COLUMN IF NOT EXISTS face_embedding_v vector(512);
+
+UPDATE beneficiaries
+SET face_embedding_v = face_embedding::vector(512)
+WHERE face_embedding_v IS NULL
+  AND face_embedding LIKE '[%';
+
+CREATE INDEX IF NOT EXISTS idx_beneficiaries_face_embedding_v
+  ON beneficiaries USING hnsw (face_embedding_v vector_cosine_ops);
+
+CREATE OR REPLACE FUNCTION match_beneficiary_faces(
+  query_embedding vector(512),
+  match_count int DEFAULT 1
+)
+RETURNS TABLE (
+  id uuid,
+  card_number text,
+  distance float8
+)
+LANGUAGE sql
+STABLE
+AS $$
+  SELECT b.id, b.card_number, b.face_embedding_v <=> query_embedding AS distance
+  FROM beneficiaries b
+  WHERE b.face_embedding_v IS NOT NULL
+  ORDER BY b.face_embedding_v <=> query_embedding
+  LIMIT match_count;
+$$;
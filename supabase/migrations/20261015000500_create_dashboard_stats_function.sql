@@ -0,0 +1,49 @@
+/*
+  # Dashboard statistics function
+
+  ## Overview
+  Computes every counter shown on the dashboard in a single statement, with
+  one scan per table, instead of six separate `count="exact"` requests.
+
+  ## New Functions
+
+  ### `get_dashboard_stats()`
+  Returns a JSON object with:
+  - `total_beneficiaries` / `active_beneficiaries`
+  - `total_transactions` / `flagged_transactions`
+  - `pending_alerts` / `critical_alerts` (critical and still pending)
+*/
+
+CREATE OR REPLACE FUNCTION get_dashboard_stats()
+RETURNS json
+LANGUAGE sql
+STABLE
+AS $$
+  SELECT json_build_object(
+    'total_beneficiaries', b.total,
+    'active_beneficiaries', b.active,
+    'total_transactions', t.total,
+    'flagged_transactions', t.flagged,
+    'pending_alerts', a.pending,
+    'critical_alerts', a.critical
+  )
+  FROM
+    (
+      SELECT
+        count(*) AS total,
+        count(*) FILTER (WHERE status = 'active') AS active
+      FROM beneficiaries
+    ) b,
+    (
+      SELECT
+        count(*) AS total,
+        count(*) FILTER (WHERE status = 'flagged') AS flagged
+      FROM transactions
+    ) t,
+    (
+      SELECT
+        count(*) FILTER (WHERE status = 'pending') AS pending,
+        count(*) FILTER (WHERE status = 'pending' AND severity = 'critical') AS critical
+      FROM duplicate_alerts
+    ) a;
+$$;
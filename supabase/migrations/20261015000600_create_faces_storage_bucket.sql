@@ -0,0 +1,16 @@
+/*
+  # Face image storage bucket
+
+  ## Overview
+  Registration and verification images are now uploaded to Supabase Storage
+  instead of storing a truncated base64 prefix in the table.
+  `beneficiaries.face_image_url` and `transactions.captured_image_url` hold
+  the object path inside this bucket.
+
+  ## Changes
+  - Private `faces` storage bucket (accessed with the service role key)
+*/
+
+INSERT INTO storage.buckets (id, name, public)
+VALUES ('faces', 'faces', false)
+ON CONFLICT (id) DO NOTHING;
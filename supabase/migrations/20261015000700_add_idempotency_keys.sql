@@ -0,0 +1,17 @@
+/*
+  # Idempotency keys for retried inserts
+
+  ## Overview
+  The backend retries Supabase requests that fail with 429 / 5xx or a
+  network error. An insert whose response was lost would otherwise be
+  written twice on retry, so each transaction and alert row now carries a
+  client-generated key and is written with
+  `upsert(..., on_conflict="idempotency_key")`.
+
+  ## Changes
+  - `transactions.idempotency_key` (uuid, unique)
+  - `duplicate_alerts.idempotency_key` (uuid, unique)
+*/
+
+ALTER TABLE transactions ADD COLUMN IF NOT EXISTS idempotency_key uuid UNIQUE;
+ALTER TABLE duplicate_alerts ADD COLUMN IF NOT EXISTS idempotency_key uuid UNIQUE;
@@ -0,0 +1,17 @@
+/*
+  # Idempotency key for beneficiary registration
+
+  ## Overview
+  Registration inserts are retried on 429 / 5xx and network errors. If the
+  first insert succeeded but its response was lost, the retry hit the
+  `card_number` unique constraint and the endpoint reported a failure for
+  a registration that had been stored. Beneficiary rows now carry a
+  client-generated key and are written with
+  `upsert(..., on_conflict="idempotency_key")`, like transactions and
+  alerts.
+
+  ## Changes
+  - `beneficiaries.idempotency_key` (uuid, unique)
+*/
+
+ALTER TABLE beneficiaries ADD COLUMN IF NOT EXISTS idempotency_key uuid UNIQUE;
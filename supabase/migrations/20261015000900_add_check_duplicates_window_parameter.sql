@@ -0,0 +1,107 @@
+/*
+  # Configurable suspicious timing window for check_duplicates
+
+  ## Overview
+  The suspicious_timing rule in `check_duplicates` hardcoded a 2 hour
+  window, so the backend's `SUSPICIOUS_TIMING_WINDOW_HOURS` setting only
+  affected the per-rule fallback. The window is now a parameter and the
+  backend passes the configured value.
+
+  ## Changes
+  - Replaces `check_duplicates(p_beneficiary_id, p_card_number, p_shop_id, p_cycle_id)`
+    with `check_duplicates(p_beneficiary_id, p_card_number, p_shop_id, p_cycle_id, p_window_hours)`
+  - `p_window_hours` (double precision, default 2) - suspicious_timing look-back window
+*/
+
+DROP FUNCTION IF EXISTS check_duplicates(uuid, text, uuid, uuid);
+
+CREATE OR REPLACE FUNCTION check_duplicates(
+  p_beneficiary_id uuid,
+  p_card_number text,
+  p_shop_id uuid,
+  p_cycle_id uuid DEFAULT NULL,
+  p_window_hours double precision DEFAULT 2
+)
+RETURNS TABLE (
+  alert_type text,
+  description text,
+  severity text,
+  previous_transaction_id uuid
+)
+LANGUAGE sql
+STABLE
+AS $$
+  WITH same_card_different_person AS (
+    SELECT recent.id
+    FROM (
+      SELECT t.id, t.beneficiary_id, t.created_at
+      FROM transactions t
+      WHERE t.card_number = p_card_number
+      ORDER BY t.created_at DESC
+      LIMIT 5
+    ) recent
+    WHERE recent.beneficiary_id IS DISTINCT FROM p_beneficiary_id
+    ORDER BY recent.created_at DESC
+    LIMIT 1
+  ),
+  duplicate_location AS (
+    SELECT recent.id
+    FROM (
+      SELECT t.id, t.shop_id, t.created_at
+      FROM transactions t
+      WHERE t.beneficiary_id = p_beneficiary_id
+        AND t.status = 'success'
+        AND (p_cycle_id IS NULL OR t.cycle_id = p_cycle_id)
+      ORDER BY t.created_at DESC
+      LIMIT 10
+    ) recent
+    WHERE recent.shop_id IS DISTINCT FROM p_shop_id
+    ORDER BY recent.created_at DESC
+    LIMIT 1
+  ),
+  multiple_attempts AS (
+    SELECT
+      count(*) AS attempts,
+      (array_agg(t.id ORDER BY t.created_at DESC))[1] AS id
+    FROM transactions t
+    WHERE t.beneficiary_id = p_beneficiary_id
+      AND t.status = 'success'
+      AND (p_cycle_id IS NULL OR t.cycle_id = p_cycle_id)
+    HAVING count(*) > 1
+  ),
+  suspicious_timing AS (
+    SELECT t.id, extract(epoch FROM now() - t.created_at) / 3600 AS hours_diff
+    FROM transactions t
+    WHERE t.beneficiary_id = p_beneficiary_id
+      AND t.created_at > now() - p_window_hours * interval '1 hour'
+    ORDER BY t.created_at DESC
+    LIMIT 1
+  )
+  SELECT
+    'different_person',
+    format('Card %s was used by a different person in previous transaction', p_card_number),
+    'critical',
+    id
+  FROM same_card_different_person
+  UNION ALL
+  SELECT
+    'duplicate_location',
+    'Beneficiary already collected rations from a different shop in this cycle',
+    'high',
+    id
+  FROM duplicate_location
+  UNION ALL
+  SELECT
+    'multiple_attempts',
+    format('Beneficiary has %s transactions in current cycle', attempts),
+    'high',
+    id
+  FROM multiple_attempts
+  UNION ALL
+  SELECT
+    'suspicious_timing',
+    format('Multiple transactions within %s hours', round(hours_diff::numeric, 1)),
+    'medium',
+    id
+  FROM suspicious_timing;
+$$;